@@ -0,0 +1,54 @@
+"""Import-time regression check for the CLI modules (`python -X importtime`).
+
+Fails (exit 1) when importing any module costs more than the budget, e.g.
+because a heavy dependency crept back into module scope:
+
+    python ops/scripts/bench_startup.py --budget-ms 150
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+MODULES = ["question_db", "vector_store", "vectorize_pdfs", "generate_questions"]
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_time_us(module: str) -> int:
+    """Cumulative import time of ``module`` in a fresh interpreter, in microseconds."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in proc.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise RuntimeError(f"no importtime entry for {module}:\n{proc.stderr[-2000:]}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Check CLI module import time against a budget")
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "150")))
+    ap.add_argument("--repeats", type=int, default=5, help="Best of N fresh interpreters per module")
+    ap.add_argument("modules", nargs="*", default=MODULES)
+    args = ap.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        best_ms = min(import_time_us(module) for _ in range(max(1, args.repeats))) / 1000.0
+        ok = best_ms <= args.budget_ms
+        failed |= not ok
+        print(f"{module:<20} {best_ms:8.1f} ms  {'ok' if ok else 'OVER BUDGET'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
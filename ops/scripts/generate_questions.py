@@ -6,19 +6,21 @@ and distinction-level rationales (cite cases when present in context).
 """
 from __future__ import annotations
 
-import os, argparse, json, time, logging, math, itertools, hashlib
-from typing import Dict, List, Optional, Tuple
-from dotenv import load_dotenv
-import numpy as np
-from openai import AzureOpenAI
+import os, argparse, json, time, logging, math, gzip, re
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-from vector_store import QdrantVectorStore
-from question_db import insert_mcq_batch, list_subject_topics
+from lazy import lazy_module
+from vector_store import QdrantVectorStore, SearchCache, default_search_cache_dir, reduce_dim
+from question_db import (
+    insert_mcq_batch, list_subject_topics, load_subject_topics, save_subject_topics, stem_fingerprint,
+)
 
-load_dotenv(".env.ai", override=True)
+if TYPE_CHECKING:
+    from openai import AzureOpenAI
 
-LOG_DIR = "ops/logs"
-os.makedirs(LOG_DIR, exist_ok=True)
+np = lazy_module("numpy")
+
+LOG_DIR = "ops/logs"  # created in main(); importing this module has no side effects
 
 # --------- PROMPTS -----------------------------------------------------------
 
@@ -178,6 +180,7 @@ Rules:
 # --------- CLIENTS -----------------------------------------------------------
 
 def embed_client() -> AzureOpenAI:
+    from openai import AzureOpenAI
     return AzureOpenAI(
         api_key=os.environ["AOAI_EMBEDDINGS_KEY"],
         azure_endpoint=os.environ["AOAI_EMBEDDINGS_ENDPOINT"].rstrip("/"),
@@ -185,6 +188,7 @@ def embed_client() -> AzureOpenAI:
     )
 
 def chat_client() -> AzureOpenAI:
+    from openai import AzureOpenAI
     return AzureOpenAI(
         api_key=os.environ["AOAI_CHAT_KEY"],
         azure_endpoint=os.environ["AOAI_CHAT_ENDPOINT"].rstrip("/"),
@@ -223,14 +227,26 @@ def infer_topics(cli_chat: AzureOpenAI, subject: str, hints: List[str], chat_dep
 
 # --------- CONTEXT RETRIEVAL (ROTATING) -------------------------------------
 
-def embed_query(cli_emb: AzureOpenAI, emb_deploy: str, text: str) -> np.ndarray:
-    vec = cli_emb.embeddings.create(model=emb_deploy, input=[text]).data[0].embedding
-    return np.asarray(vec, dtype=np.float32)
+def embed_queries(cli_emb: AzureOpenAI, emb_deploy: str, texts: List[str], dims: Optional[int] = None,
+                  request_dims: bool = True) -> List[np.ndarray]:
+    """Embed several query strings in one request (order preserved).
+
+    ``dims`` must match the dimension used by vectorize_pdfs.py; with
+    ``request_dims`` False the vectors are truncated locally instead.
+    """
+    kwargs = {"dimensions": dims} if dims and request_dims else {}
+    data = cli_emb.embeddings.create(model=emb_deploy, input=texts, **kwargs).data
+    return [reduce_dim(d.embedding, dims) for d in data]
+
+def embed_query(cli_emb: AzureOpenAI, emb_deploy: str, text: str, dims: Optional[int] = None,
+                request_dims: bool = True) -> np.ndarray:
+    return embed_queries(cli_emb, emb_deploy, [text], dims, request_dims)[0]
 
 def fetch_pool(store: QdrantVectorStore, subject: str, topic: str, qvec: np.ndarray, per_question: int, need_questions: int) -> List[Dict]:
     """Pull a pool so we can slice unique bundles per question without reuse."""
     pool_size = max(24, min(800, int(math.ceil(per_question * need_questions * 1.2))))
-    hits = store.search(subject, qvec, top_k=pool_size) or []
+    # Hybrid (dense + lexical) so case names/citations in the topic match on the first fetch
+    hits = store.search(subject, qvec, top_k=pool_size, query_text=topic) or []
     return hits
 
 def bundle_context(hits: List[Dict], used_keys: set, per_question: int) -> Tuple[str, List[str], List[str]]:
@@ -243,7 +259,7 @@ def bundle_context(hits: List[Dict], used_keys: set, per_question: int) -> Tuple
         src = h.get("source_path") or "material"
         page = h.get("page")
         cidx = h.get("chunk_index", None)
-        key = f"{src}#p{page}|{cidx}"
+        key = h.get("content_hash") or f"{src}#p{page}|{cidx}"
         if key in used_keys:
             continue
         txt = (h.get("text") or "").strip()
@@ -265,77 +281,206 @@ def bundle_context(hits: List[Dict], used_keys: set, per_question: int) -> Tuple
         refs.append(f"{src}#{page_fragment}")
     return ("\n\n".join(ctx_lines), refs, keys_now)
 
-# --------- DEDUP HELPERS -----------------------------------------------------
+# --------- CHECKPOINTS -------------------------------------------------------
+
+CHECKPOINT_DIR = "ops/data"
 
-def stem_fingerprint(stem: str) -> str:
-    s = " ".join(stem.split()).casefold()
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+def checkpoint_path(run_id: str) -> str:
+    return os.path.join(CHECKPOINT_DIR, f"run_{run_id}.json.gz")
+
+def new_run_id(subject: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", subject).strip("-").lower() or "subject"
+    return f"{slug}-{int(time.time())}"
+
+def save_checkpoint(run_id: str, state: Dict) -> None:
+    """Atomically write run state (gzip JSON) so a crash never leaves a torn file.
+
+    Pools are stored as Qdrant point ids only; texts are re-read on resume.
+    """
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = checkpoint_path(run_id)
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=1) as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def load_checkpoint(run_id: str) -> Dict:
+    with gzip.open(checkpoint_path(run_id), "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+def remove_checkpoint(run_id: str) -> None:
+    try:
+        os.remove(checkpoint_path(run_id))
+    except FileNotFoundError:
+        pass
 
 # --------- MAIN PIPELINE -----------------------------------------------------
 
 def main():
+    from dotenv import load_dotenv
+    load_dotenv(".env.ai", override=True)  # before argparse: defaults read AOAI_* env vars
+
     ap = argparse.ArgumentParser(description="Generate SQE1 MCQs (topic-driven, one-per-call, rotating context, 80/20 mix)")
-    ap.add_argument("--subject", required=True, help="e.g., 'Contract Law'")
+    ap.add_argument("--subject", help="e.g., 'Contract Law' (required unless --resume)")
     ap.add_argument("--topic", required=False, help="If omitted, we infer granular topics and round-robin them.")
-    ap.add_argument("--n", type=int, default=5, help="Total number of questions to generate")
+    ap.add_argument("--n", type=int, default=None, help="Total number of questions to generate (default 5; on --resume, the checkpointed target)")
     ap.add_argument("--per-context", type=int, default=12, help="Context snippets per question (bundle size)")
     ap.add_argument("--max-topics", type=int, default=24, help="Cap on inferred topics when --topic not provided")
+    ap.add_argument("--topics-ttl-hours", type=float, default=float(os.getenv("TOPICS_TTL_HOURS", "168")),
+                    help="Reuse the stored topic catalogue (and its embeddings) until it is this old.")
+    ap.add_argument("--refresh-topics", action="store_true",
+                    help="Ignore the stored topic catalogue and re-infer/re-embed topics.")
     ap.add_argument("--temperature", type=float, default=0.2)
     ap.add_argument("--chat-deploy", default=os.getenv("AOAI_CHAT_DEPLOYMENT", "mcqgenerate"))
     ap.add_argument("--emb-deploy", default=os.getenv("AOAI_EMBEDDINGS_DEPLOYMENT", "embed-sqe"))
     ap.add_argument("--collection", default=os.getenv("QDRANT_COLLECTION"),
                     help="Override Qdrant collection name (defaults to env or 'sqe1_material').")
+    ap.add_argument("--emb-dims", type=int, default=int(os.getenv("AOAI_EMBEDDINGS_DIMENSIONS") or 0) or None,
+                    help="Reduced query embedding dimension; must match the one used by vectorize_pdfs.py.")
+    ap.add_argument("--emb-dims-local", action="store_true",
+                    help="Truncate + renormalise locally instead of requesting `dimensions` from the API.")
+    ap.add_argument("--search-cache-dir", default=default_search_cache_dir(),
+                    help="Directory persisting Qdrant search results between runs (env QDRANT_SEARCH_CACHE_DIR).")
+    ap.add_argument("--search-cache-ttl-hours", type=float, default=168.0,
+                    help="Discard cached search results older than this (default one week).")
+    ap.add_argument("--no-search-cache", action="store_true", help="Always query Qdrant directly.")
+    ap.add_argument("--resume", metavar="RUN_ID", help="Continue a checkpointed run from ops/data/run_<RUN_ID>.json.gz")
     ap.add_argument("--debug", action="store_true")
     args = ap.parse_args()
+    if not args.subject and not args.resume:
+        ap.error("--subject is required unless --resume is given")
 
     logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO, format="%(levelname)s %(message)s")
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    # Cached topic embeddings are only reusable at the same dimension
+    emb_key = f"{args.emb_deploy}@{args.emb_dims}" if args.emb_dims else args.emb_deploy
 
     cli_emb = embed_client()
     cli_chat = chat_client()
-    store = QdrantVectorStore(collection=args.collection or os.getenv("QDRANT_COLLECTION", "sqe1_material"))
-
-    subject = args.subject
-    total_needed = max(1, args.n)
+    store = QdrantVectorStore(
+        collection=args.collection or os.getenv("QDRANT_COLLECTION", "sqe1_material"),
+        cache=None if args.no_search_cache else SearchCache(
+            path=args.search_cache_dir or None, ttl_hours=args.search_cache_ttl_hours,
+        ),
+    )
 
-    # 0) Topics
-    if args.topic:
-        topics = [args.topic]
+    if args.resume:
+        ckpt = load_checkpoint(args.resume)
+        run_id = args.resume
+        subject = ckpt["subject"]
+        if args.subject and args.subject != subject:
+            ap.error(f"run {run_id} is for subject '{subject}', not '{args.subject}'")
+        args.per_context = ckpt["per_context"]
+        # Top-up queries must match the dimension the run started with
+        args.emb_dims = ckpt.get("emb_dims")
+        args.emb_dims_local = ckpt.get("emb_dims_local", False)
+        total_needed = max(1, args.n if args.n is not None else ckpt["total_needed"])
+        topics = ckpt["topics"]
+        pool_by_topic: Dict[str, List[Dict]] = {
+            t: store.fetch_hits(ids) for t, ids in ckpt["pool_ids_by_topic"].items()
+        }
+        idx_by_topic: Dict[str, int] = ckpt["idx_by_topic"]
+        used_keys_global: set = set(ckpt["used_keys"])
+        seen_stems: set = set(ckpt["seen_stems"])
+        scenario_count = ckpt["scenario_count"]
+        recall_count = ckpt["recall_count"]
+        made = ckpt["made"]
+        attempt_guard = ckpt["attempts"]
+        rr_pos = ckpt["rr_pos"]
+        per_topic_target = max(1, math.ceil(total_needed / len(topics)))
+        qvec_by_topic: Dict[str, np.ndarray] = {}
+        logging.info("Resuming run %s: %d/%d saved, %d attempts used.", run_id, made, total_needed, attempt_guard)
     else:
-        try:
-            hints = list_subject_topics(subject)
-        except Exception:
-            logging.exception("Failed to load existing topic hints; continuing without.")
-            hints = []
-        topics = infer_topics(cli_chat, subject, hints, args.chat_deploy, args.max_topics)
-        if not topics:
-            topics = ["Core doctrines and leading cases"]
-        logging.info("Using %d topics (round-robin): %s", len(topics), ", ".join(topics[:10]) + ("..." if len(topics) > 10 else ""))
-
-    # 1) Prepare per-topic pools and pointers
-    per_topic_target = max(1, math.ceil(total_needed / len(topics)))
-    qvec_by_topic: Dict[str, np.ndarray] = {}
-    pool_by_topic: Dict[str, List[Dict]] = {}
-    idx_by_topic: Dict[str, int] = {t: 0 for t in topics}
-    used_keys_global: set = set()
-    seen_stems: set = set()
-
-    for t in topics:
-        qvec = embed_query(cli_emb, args.emb_deploy, t)
-        qvec_by_topic[t] = qvec
-        pool_by_topic[t] = fetch_pool(store, subject, t, qvec, args.per_context, per_topic_target)
+        run_id = new_run_id(args.subject)
+        subject = args.subject
+        total_needed = max(1, args.n if args.n is not None else 5)
+        logging.info("Run id %s (continue after a failure with --resume %s)", run_id, run_id)
+
+        # 0) Topics (reuse the stored catalogue + embeddings while fresh)
+        qvec_by_topic: Dict[str, np.ndarray] = {}
+        if args.topic:
+            topics = [args.topic]
+        else:
+            cached = None
+            if not args.refresh_topics:
+                try:
+                    cached = load_subject_topics(subject, args.topics_ttl_hours, emb_key)
+                except Exception:
+                    logging.exception("Failed to load topic catalogue; re-inferring topics.")
+            if cached:
+                cached = cached[:args.max_topics]
+                topics = [name for name, _emb in cached]
+                for name, emb in cached:
+                    if emb:
+                        qvec_by_topic[name] = np.frombuffer(emb, dtype=np.float32)
+                logging.info("Reusing %d stored topics for '%s'.", len(topics), subject)
+            else:
+                try:
+                    hints = list_subject_topics(subject)
+                except Exception:
+                    logging.exception("Failed to load existing topic hints; continuing without.")
+                    hints = []
+                topics = infer_topics(cli_chat, subject, hints, args.chat_deploy, args.max_topics)
+                if topics:
+                    qvec_by_topic.update(zip(topics, embed_queries(cli_emb, args.emb_deploy, topics, args.emb_dims, not args.emb_dims_local)))
+                    try:
+                        save_subject_topics(
+                            subject,
+                            [(t, qvec_by_topic[t].astype(np.float32).tobytes()) for t in topics],
+                            emb_key,
+                        )
+                    except Exception:
+                        logging.exception("Failed to store topic catalogue; continuing.")
+                else:
+                    topics = ["Core doctrines and leading cases"]
+            logging.info("Using %d topics (round-robin): %s", len(topics), ", ".join(topics[:10]) + ("..." if len(topics) > 10 else ""))
+
+        # 1) Prepare per-topic pools and pointers
+        per_topic_target = max(1, math.ceil(total_needed / len(topics)))
+        pool_by_topic: Dict[str, List[Dict]] = {}
+        idx_by_topic: Dict[str, int] = {t: 0 for t in topics}
+        used_keys_global: set = set()
+        seen_stems: set = set()
+
+        for t in topics:
+            if t not in qvec_by_topic:
+                qvec_by_topic[t] = embed_query(cli_emb, args.emb_deploy, t, args.emb_dims, not args.emb_dims_local)
+            pool_by_topic[t] = fetch_pool(store, subject, t, qvec_by_topic[t], args.per_context, per_topic_target)
+
+        scenario_count = 0
+        recall_count = 0
+        made = 0
+        attempt_guard = 0
+        rr_pos = 0
+
+    def checkpoint() -> None:
+        save_checkpoint(run_id, {
+            "subject": subject,
+            "total_needed": total_needed,
+            "per_context": args.per_context,
+            "emb_dims": args.emb_dims,
+            "emb_dims_local": args.emb_dims_local,
+            "topics": topics,
+            "pool_ids_by_topic": {t: [h["id"] for h in hits] for t, hits in pool_by_topic.items()},
+            "idx_by_topic": idx_by_topic,
+            "used_keys": sorted(used_keys_global),
+            "seen_stems": sorted(seen_stems),
+            "scenario_count": scenario_count,
+            "recall_count": recall_count,
+            "made": made,
+            "attempts": attempt_guard,
+            "rr_pos": rr_pos,
+        })
 
     # 2) Generate one question per call, cycling topics, enforcing 80/20 qtype mix
-    scenario_count = 0
-    recall_count = 0
-    all_items: List[Dict] = []
-    round_robin = itertools.cycle(topics)
-    made = 0
-    attempt_guard = 0
     MAX_ATTEMPTS = total_needed * 6  # safety
 
     while made < total_needed and attempt_guard < MAX_ATTEMPTS:
+        checkpoint()  # state as of the end of the previous attempt
         attempt_guard += 1
-        topic = next(round_robin)
+        topic = topics[rr_pos % len(topics)]
+        rr_pos += 1
 
         # qtype selection: aim for 80% scenario overall
         desired_scenarios_by_now = round((made + 1) * 0.8)
@@ -349,7 +494,7 @@ def main():
         if not ctx:
             # Top-up: fetch a fresh pool with a jittered seed
             jittered = f"{topic} — exceptions, contrasts, leading authorities"
-            qvec_by_topic[topic] = embed_query(cli_emb, args.emb_deploy, jittered)
+            qvec_by_topic[topic] = embed_query(cli_emb, args.emb_deploy, jittered, args.emb_dims, not args.emb_dims_local)
             pool_by_topic[topic] = fetch_pool(store, subject, topic, qvec_by_topic[topic], args.per_context, per_topic_target)
             idx_by_topic[topic] = 0
             hits = pool_by_topic[topic]
@@ -442,6 +587,8 @@ def main():
         logging.info("Saved Q%02d/%02d | topic='%s' | qtype=%s", made, total_needed, out_payload["topic"], qtype)
         logging.debug("Artifacts:\n  Prompt:   %s\n  Messages: %s\n  Response: %s", prompt_path, messages_path, response_path)
 
+    remove_checkpoint(run_id)  # finished; nothing left to resume
+
     # 5) Write an aggregate artifact for quick review (optional)
     os.makedirs("ops/data", exist_ok=True)
     ts_all = int(time.time())
@@ -0,0 +1,24 @@
+"""Deferred imports so the CLIs start fast and `--help` never loads heavy deps."""
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+from typing import Optional
+
+
+class _LazyModule(ModuleType):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attr: str):
+        if attr == "_module":
+            raise AttributeError(attr)
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return getattr(self._module, attr)
+
+
+def lazy_module(name: str) -> ModuleType:
+    """Return a proxy that imports ``name`` on first attribute access."""
+    return _LazyModule(name)
@@ -1,14 +1,24 @@
 from __future__ import annotations
 
+import argparse
+import functools
+import gzip
+import hashlib
+import json
 import os
-from typing import Any, Dict, Iterable, List
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-import psycopg
-from psycopg import conninfo
-from psycopg.rows import tuple_row
-from psycopg.types.json import Json
+from lazy import lazy_module
 
+psycopg = lazy_module("psycopg")
+psycopg_conninfo = lazy_module("psycopg.conninfo")
+psycopg_rows = lazy_module("psycopg.rows")
+psycopg_json = lazy_module("psycopg.types.json")
 
+
+@functools.lru_cache(maxsize=None)
 def _build_conninfo() -> str:
     direct = (
         os.getenv("QUESTIONS_DSN")
@@ -30,10 +40,8 @@ def _build_conninfo() -> str:
     sslmode = os.getenv("PGSSLMODE") or os.getenv("POSTGRES_SSLMODE")
     if sslmode:
         params["sslmode"] = sslmode
-    return conninfo.make_conninfo(**params)
-
+    return psycopg_conninfo.make_conninfo(**params)
 
-_CONNINFO = _build_conninfo()
 
 SCHEMA_STATEMENTS: List[str] = [
     """
@@ -105,18 +113,270 @@ SCHEMA_STATEMENTS: List[str] = [
     """
     CREATE INDEX IF NOT EXISTS ix_drill_items_question ON drill_items(question_id)
     """,
+    # Sampling support: every question carries a fixed random key so that
+    # "N random unseen questions" is an index range scan from a random pivot
+    # instead of ORDER BY RANDOM() over the whole bank. Guarded by catalogue
+    # checks: ALTER TABLE takes ACCESS EXCLUSIVE on questions even when the
+    # column already exists, which would block drill reads on every run.
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+             WHERE table_schema = current_schema() AND table_name = 'questions' AND column_name = 'rand_key'
+        ) THEN
+            ALTER TABLE questions
+                ADD COLUMN rand_key DOUBLE PRECISION NOT NULL DEFAULT random();
+        END IF;
+        IF to_regclass('ix_questions_sample') IS NULL THEN
+            CREATE INDEX ix_questions_sample ON questions(subject_id, rand_key) WHERE is_active;
+        END IF;
+        IF to_regclass('ix_questions_rand') IS NULL THEN
+            CREATE INDEX ix_questions_rand ON questions(rand_key) WHERE is_active;
+        END IF;
+    END;
+    $$
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_seen_questions (
+        user_id TEXT NOT NULL,
+        question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+        first_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (user_id, question_id)
+    )
+    """,
+    """
+    CREATE OR REPLACE FUNCTION trg_drill_items_mark_seen() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO user_seen_questions (user_id, question_id)
+        SELECT ds.user_id, NEW.question_id
+          FROM drill_sessions ds
+         WHERE ds.id = NEW.session_id
+           AND ds.user_id IS NOT NULL
+        ON CONFLICT (user_id, question_id) DO NOTHING;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'drill_items_mark_seen') THEN
+            CREATE TRIGGER drill_items_mark_seen
+                AFTER INSERT ON drill_items
+                FOR EACH ROW EXECUTE FUNCTION trg_drill_items_mark_seen();
+        END IF;
+    END;
+    $$
+    """,
+    # Per-subject topic catalogue with cached query embeddings (float32
+    # bytes), reused by generate_questions.py until it goes stale.
+    """
+    CREATE TABLE IF NOT EXISTS topics (
+        id SERIAL PRIMARY KEY,
+        subject_id INTEGER NOT NULL REFERENCES subjects(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        embedding BYTEA,
+        emb_deploy TEXT,
+        refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        UNIQUE (subject_id, name)
+    )
+    """,
+    # Ready-to-serve question document (stem, topic, choices, refs) kept in
+    # sync by triggers, so a drill step is a single indexed read.
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+             WHERE table_schema = current_schema() AND table_name = 'questions' AND column_name = 'doc'
+        ) THEN
+            ALTER TABLE questions ADD COLUMN doc JSONB;
+        END IF;
+    END;
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION trg_questions_build_doc() RETURNS trigger AS $$
+    BEGIN
+        NEW.doc := jsonb_build_object(
+            'id', NEW.id,
+            'subject_id', NEW.subject_id,
+            'topic', NEW.topic,
+            'stem', NEW.stem,
+            'answer_index', NEW.answer_index,
+            'rationale_correct', NEW.rationale_correct,
+            'source_refs', NEW.source_refs,
+            'is_active', NEW.is_active,
+            'choices', COALESCE(
+                (SELECT jsonb_agg(
+                            jsonb_build_object('label', c.label, 'text', c.text, 'rationale', c.rationale)
+                            ORDER BY c.label)
+                   FROM choices c
+                  WHERE c.question_id = NEW.id),
+                '[]'::jsonb
+            )
+        );
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION trg_choices_touch_doc() RETURNS trigger AS $$
+    BEGIN
+        -- Any write to questions re-runs trg_questions_build_doc.
+        UPDATE questions SET doc = NULL
+         WHERE id IN (SELECT DISTINCT question_id FROM changed_choices);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'questions_build_doc') THEN
+            CREATE TRIGGER questions_build_doc
+                BEFORE INSERT OR UPDATE ON questions
+                FOR EACH ROW EXECUTE FUNCTION trg_questions_build_doc();
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'choices_doc_insert') THEN
+            CREATE TRIGGER choices_doc_insert
+                AFTER INSERT ON choices REFERENCING NEW TABLE AS changed_choices
+                FOR EACH STATEMENT EXECUTE FUNCTION trg_choices_touch_doc();
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'choices_doc_update') THEN
+            CREATE TRIGGER choices_doc_update
+                AFTER UPDATE ON choices REFERENCING NEW TABLE AS changed_choices
+                FOR EACH STATEMENT EXECUTE FUNCTION trg_choices_touch_doc();
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'choices_doc_delete') THEN
+            CREATE TRIGGER choices_doc_delete
+                AFTER DELETE ON choices REFERENCING OLD TABLE AS changed_choices
+                FOR EACH STATEMENT EXECUTE FUNCTION trg_choices_touch_doc();
+        END IF;
+    END;
+    $$
+    """,
+    # Per-user daily rollup so KPI reads touch one row per (day, subject)
+    # rather than the user's full drill_items history.
+    """
+    CREATE TABLE IF NOT EXISTS user_daily_stats (
+        user_id TEXT NOT NULL,
+        day DATE NOT NULL,
+        subject TEXT NOT NULL,
+        attempted INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0,
+        elapsed_ms BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day, subject)
+    )
+    """,
+    """
+    CREATE OR REPLACE FUNCTION trg_drill_items_daily_stats() RETURNS trigger AS $$
+    DECLARE
+        uid TEXT;
+        subj TEXT;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.answered_at IS NOT NULL THEN
+            SELECT ds.user_id, ds.subject INTO uid, subj
+              FROM drill_sessions ds WHERE ds.id = OLD.session_id;
+            IF uid IS NOT NULL THEN
+                UPDATE user_daily_stats
+                   SET attempted = attempted - 1,
+                       correct = correct - (CASE WHEN OLD.is_correct THEN 1 ELSE 0 END),
+                       elapsed_ms = elapsed_ms - COALESCE(OLD.elapsed_ms, 0)
+                 WHERE user_id = uid AND day = (OLD.answered_at AT TIME ZONE 'UTC')::date AND subject = subj;
+            END IF;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.answered_at IS NOT NULL THEN
+            SELECT ds.user_id, ds.subject INTO uid, subj
+              FROM drill_sessions ds WHERE ds.id = NEW.session_id;
+            IF uid IS NOT NULL THEN
+                INSERT INTO user_daily_stats (user_id, day, subject, attempted, correct, elapsed_ms)
+                VALUES (
+                    uid,
+                    (NEW.answered_at AT TIME ZONE 'UTC')::date,
+                    subj,
+                    1,
+                    CASE WHEN NEW.is_correct THEN 1 ELSE 0 END,
+                    COALESCE(NEW.elapsed_ms, 0)
+                )
+                ON CONFLICT (user_id, day, subject) DO UPDATE SET
+                    attempted = user_daily_stats.attempted + EXCLUDED.attempted,
+                    correct = user_daily_stats.correct + EXCLUDED.correct,
+                    elapsed_ms = user_daily_stats.elapsed_ms + EXCLUDED.elapsed_ms;
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Deleting a session cascades to drill_items after the session row is
+    # gone, so the per-item trigger can no longer resolve the user; subtract
+    # the session's answered items here instead.
+    """
+    CREATE OR REPLACE FUNCTION trg_drill_sessions_daily_stats() RETURNS trigger AS $$
+    BEGIN
+        IF OLD.user_id IS NOT NULL THEN
+            UPDATE user_daily_stats u
+               SET attempted = u.attempted - agg.attempted,
+                   correct = u.correct - agg.correct,
+                   elapsed_ms = u.elapsed_ms - agg.elapsed_ms
+              FROM (
+                  SELECT (di.answered_at AT TIME ZONE 'UTC')::date AS day,
+                         COUNT(*) AS attempted,
+                         SUM(CASE WHEN di.is_correct THEN 1 ELSE 0 END) AS correct,
+                         SUM(COALESCE(di.elapsed_ms, 0)) AS elapsed_ms
+                    FROM drill_items di
+                   WHERE di.session_id = OLD.id
+                     AND di.answered_at IS NOT NULL
+                   GROUP BY 1
+              ) agg
+             WHERE u.user_id = OLD.user_id AND u.subject = OLD.subject AND u.day = agg.day;
+        END IF;
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'drill_items_daily_stats') THEN
+            CREATE TRIGGER drill_items_daily_stats
+                AFTER INSERT OR DELETE OR UPDATE OF answered_at, is_correct, elapsed_ms ON drill_items
+                FOR EACH ROW EXECUTE FUNCTION trg_drill_items_daily_stats();
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'drill_sessions_daily_stats') THEN
+            CREATE TRIGGER drill_sessions_daily_stats
+                BEFORE DELETE ON drill_sessions
+                FOR EACH ROW EXECUTE FUNCTION trg_drill_sessions_daily_stats();
+        END IF;
+    END;
+    $$
+    """,
 ]
 
 
 def _conn():
-    return psycopg.connect(_CONNINFO, row_factory=tuple_row)
+    return psycopg.connect(_build_conninfo(), row_factory=psycopg_rows.tuple_row)
+
+
+_schema_ready = False
 
 
 def ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
     with _conn() as cx:
         with cx.cursor() as cur:
+            # Serialise concurrent processes (e.g. the per-subject cron fan-out):
+            # otherwise two transactions can each hold SHARE on a table from
+            # CREATE INDEX and deadlock upgrading it for ALTER/CREATE TRIGGER.
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('question_db.ensure_schema'))")
             for stmt in SCHEMA_STATEMENTS:
                 cur.execute(stmt)
+    _schema_ready = True
 
 
 def upsert_subject(name: str) -> int:
@@ -168,7 +428,7 @@ def insert_mcq_batch(subject: str, topic: str, payload: Dict[str, Any]) -> None:
                         q["stem"],
                         int(q["answer_index"]),
                         q.get("rationale_correct", ""),
-                        Json(q.get("source_refs") or []),
+                        psycopg_json.Json(q.get("source_refs") or []),
                     ),
                 )
                 question_id = int(cur.fetchone()[0])
@@ -176,23 +436,22 @@ def insert_mcq_batch(subject: str, topic: str, payload: Dict[str, Any]) -> None:
                 options: Iterable[str] = q.get("options", [])
                 wrong = q.get("rationale_incorrect", {}) or {}
                 labels = ["A", "B", "C", "D", "E"]
+                rows: List[Any] = []
                 for idx, label in enumerate(labels):
                     text = options[idx] if idx < len(options) else ""
-                    cur.execute(
-                        """
-                        INSERT INTO choices (question_id, label, text, rationale)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (question_id, label) DO UPDATE SET
-                            text = EXCLUDED.text,
-                            rationale = EXCLUDED.rationale
-                        """,
-                        (
-                            question_id,
-                            label,
-                            text,
-                            wrong.get(label, ""),
-                        ),
-                    )
+                    rows.extend((question_id, label, text, wrong.get(label, "")))
+                # One statement for all five choices so the choices trigger
+                # rebuilds the question document once rather than per label.
+                cur.execute(
+                    f"""
+                    INSERT INTO choices (question_id, label, text, rationale)
+                    VALUES {", ".join(["(%s, %s, %s, %s)"] * len(labels))}
+                    ON CONFLICT (question_id, label) DO UPDATE SET
+                        text = EXCLUDED.text,
+                        rationale = EXCLUDED.rationale
+                    """,
+                    rows,
+                )
 
 
 def list_subject_topics(subject: str, limit: int = 50) -> List[str]:
@@ -212,3 +471,432 @@ def list_subject_topics(subject: str, limit: int = 50) -> List[str]:
             )
             rows = cur.fetchall()
             return [r[0] for r in rows if r and r[0]]
+
+
+def load_subject_topics(
+    subject: str, max_age_hours: float, emb_deploy: str
+) -> Optional[List[Tuple[str, Optional[bytes]]]]:
+    """Return the stored (topic, embedding bytes) list, or ``None`` if stale.
+
+    The catalogue counts as stale when it is empty, older than
+    ``max_age_hours`` or was embedded with a different deployment.
+    """
+    ensure_schema()
+    with _conn() as cx:
+        with cx.cursor() as cur:
+            cur.execute(
+                """
+                SELECT t.name, t.embedding, t.emb_deploy,
+                       t.refreshed_at >= NOW() - make_interval(secs => %s)
+                FROM topics t
+                JOIN subjects s ON s.id = t.subject_id
+                WHERE s.name = %s
+                ORDER BY t.position
+                """,
+                (max_age_hours * 3600.0, subject),
+            )
+            rows = cur.fetchall()
+    if not rows or not all(fresh and deploy == emb_deploy for _n, _e, deploy, fresh in rows):
+        return None
+    return [(name, bytes(emb) if emb is not None else None) for name, emb, _d, _f in rows]
+
+
+def save_subject_topics(
+    subject: str, topics: List[Tuple[str, Optional[bytes]]], emb_deploy: str
+) -> None:
+    sid = upsert_subject(subject)
+    with _conn() as cx:
+        with cx.cursor() as cur:
+            cur.execute("DELETE FROM topics WHERE subject_id = %s", (sid,))
+            if not topics:
+                return
+            cur.executemany(
+                """
+                INSERT INTO topics (subject_id, position, name, embedding, emb_deploy)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (subject_id, name) DO NOTHING
+                """,
+                [(sid, pos, name, emb, emb_deploy) for pos, (name, emb) in enumerate(topics)],
+            )
+
+
+def backfill_seen_questions() -> int:
+    ensure_schema()
+    with _conn() as cx:
+        with cx.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO user_seen_questions (user_id, question_id, first_seen_at)
+                SELECT ds.user_id, di.question_id, MIN(ds.started_at)
+                FROM drill_items di
+                JOIN drill_sessions ds ON ds.id = di.session_id
+                WHERE ds.user_id IS NOT NULL
+                GROUP BY ds.user_id, di.question_id
+                ON CONFLICT (user_id, question_id) DO NOTHING
+                """
+            )
+            return cur.rowcount
+
+
+_SAMPLE_UNSEEN_SQL = """
+    SELECT q.id
+    FROM questions q
+    WHERE q.is_active
+      {subject_clause}
+      AND q.rand_key {op} %(pivot)s
+      AND NOT EXISTS (
+          SELECT 1 FROM user_seen_questions s
+          WHERE s.user_id = %(user_id)s AND s.question_id = q.id
+      )
+    ORDER BY q.rand_key
+    LIMIT %(n)s
+"""
+
+
+def sample_unseen_questions(user_id: str, subject_id: Optional[int], n: int) -> List[int]:
+    """Return up to ``n`` random active question ids the user has not seen.
+
+    Reads forward along ``rand_key`` from a random pivot and wraps around to
+    the start of the key range if the tail runs short.
+    """
+    if n < 1:
+        return []
+    ensure_schema()
+    subject_clause = "AND q.subject_id = %(subject_id)s" if subject_id is not None else ""
+    params: Dict[str, Any] = {
+        "user_id": user_id,
+        "subject_id": subject_id,
+        "pivot": random.random(),
+        "n": n,
+    }
+    with _conn() as cx:
+        with cx.cursor() as cur:
+            cur.execute(_SAMPLE_UNSEEN_SQL.format(subject_clause=subject_clause, op=">="), params)
+            ids = [int(r[0]) for r in cur.fetchall()]
+            if len(ids) < n:
+                params["n"] = n - len(ids)
+                cur.execute(_SAMPLE_UNSEEN_SQL.format(subject_clause=subject_clause, op="<"), params)
+                ids.extend(int(r[0]) for r in cur.fetchall())
+    random.shuffle(ids)
+    return ids
+
+
+def _legacy_sample_unseen(user_id: str, subject_id: Optional[int], n: int) -> List[int]:
+    # Mirrors the original drill-creation query in web/app/api/drills/route.ts.
+    with _conn() as cx:
+        with cx.cursor() as cur:
+            cur.execute(
+                """
+                SELECT DISTINCT di.question_id
+                FROM drill_items di
+                JOIN drill_sessions ds ON ds.id = di.session_id
+                WHERE ds.user_id = %s
+                """,
+                (user_id,),
+            )
+            seen = [int(r[0]) for r in cur.fetchall()]
+            subject_clause = "AND q.subject_id = %(subject_id)s" if subject_id is not None else ""
+            cur.execute(
+                f"""
+                SELECT q.id
+                FROM questions q
+                WHERE q.is_active = TRUE
+                  {subject_clause}
+                  AND NOT (q.id = ANY(%(seen)s::int[]))
+                ORDER BY RANDOM()
+                LIMIT %(n)s
+                """,
+                {"subject_id": subject_id, "seen": seen, "n": n},
+            )
+            return [int(r[0]) for r in cur.fetchall()]
+
+
+def benchmark_unseen_sampler(
+    user_id: str, subject_id: Optional[int], n: int, repeats: int = 20
+) -> Dict[str, float]:
+    ensure_schema()
+    timings: Dict[str, float] = {}
+    for name, fn in (("legacy", _legacy_sample_unseen), ("indexed", sample_unseen_questions)):
+        fn(user_id, subject_id, n)  # warm caches
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn(user_id, subject_id, n)
+        timings[name] = (time.perf_counter() - start) * 1000.0 / repeats
+    return timings
+
+
+def backfill_daily_stats() -> int:
+    # Recomputes every (user, day, subject) cell from drill_items, so it is
+    # safe to re-run; the trigger keeps the table current afterwards.
+    ensure_schema()
+    with _conn() as cx:
+        with cx.cursor() as cur:
+            cur.execute("LOCK TABLE user_daily_stats IN EXCLUSIVE MODE")
+            cur.execute("DELETE FROM user_daily_stats")
+            cur.execute(
+                """
+                INSERT INTO user_daily_stats (user_id, day, subject, attempted, correct, elapsed_ms)
+                SELECT ds.user_id,
+                       (di.answered_at AT TIME ZONE 'UTC')::date,
+                       ds.subject,
+                       COUNT(*),
+                       SUM(CASE WHEN di.is_correct THEN 1 ELSE 0 END),
+                       SUM(COALESCE(di.elapsed_ms, 0))
+                FROM drill_items di
+                JOIN drill_sessions ds ON ds.id = di.session_id
+                WHERE ds.user_id IS NOT NULL
+                  AND di.answered_at IS NOT NULL
+                GROUP BY ds.user_id, (di.answered_at AT TIME ZONE 'UTC')::date, ds.subject
+                """
+            )
+            return cur.rowcount
+
+
+def user_kpis(user_id: str) -> Dict[str, Any]:
+    """Dashboard KPIs (today, 7-day accuracy, streak) from ``user_daily_stats``."""
+    ensure_schema()
+    with _conn() as cx:
+        with cx.cursor() as cur:
+            cur.execute(
+                """
+                SELECT (NOW() AT TIME ZONE 'UTC')::date - day AS age, SUM(attempted), SUM(correct)
+                FROM user_daily_stats
+                WHERE user_id = %s
+                  AND day >= (NOW() AT TIME ZONE 'UTC')::date - 365
+                  AND attempted > 0
+                GROUP BY day
+                """,
+                (user_id,),
+            )
+            rows = cur.fetchall()
+
+    by_age = {int(age): (int(att), int(cor)) for age, att, cor in rows}
+    attempted_7d = sum(by_age[a][0] for a in by_age if 0 <= a < 7)
+    correct_7d = sum(by_age[a][1] for a in by_age if 0 <= a < 7)
+    streak = 0
+    while streak in by_age:
+        streak += 1
+    return {
+        "mcqs_today": by_age.get(0, (0, 0))[0],
+        "attempted_7d": attempted_7d,
+        "accuracy_7d": round(correct_7d * 100 / attempted_7d) if attempted_7d else None,
+        "streak_days": streak,
+    }
+
+
+def backfill_question_docs(rebuild: bool = False) -> int:
+    ensure_schema()
+    with _conn() as cx:
+        with cx.cursor() as cur:
+            # Touching the row is enough: trg_questions_build_doc fills doc.
+            where = "" if rebuild else "WHERE doc IS NULL"
+            cur.execute(f"UPDATE questions SET doc = NULL {where}")
+            return cur.rowcount
+
+
+def next_drill_step(session_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Session progress plus the next unanswered question document in one read.
+
+    Returns ``None`` if the session does not belong to the user; ``doc`` is
+    ``None`` once every item has been answered.
+    """
+    ensure_schema()
+    with _conn() as cx:
+        with cx.cursor() as cur:
+            cur.execute(
+                """
+                SELECT ds.total, di.order_index, q.doc
+                FROM drill_sessions ds
+                LEFT JOIN LATERAL (
+                    SELECT order_index, question_id
+                    FROM drill_items
+                    WHERE session_id = ds.id AND answered_at IS NULL
+                    ORDER BY order_index
+                    LIMIT 1
+                ) di ON TRUE
+                LEFT JOIN questions q ON q.id = di.question_id
+                WHERE ds.id = %s AND ds.user_id = %s
+                """,
+                (session_id, user_id),
+            )
+            row = cur.fetchone()
+    if not row:
+        return None
+    total, order_index, doc = row
+    return {"total": int(total), "order_index": order_index, "doc": doc}
+
+
+def stem_fingerprint(stem: str) -> str:
+    s = " ".join(stem.split()).casefold()
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+_EXPORT_SQL = """
+    SELECT q.id, s.name, q.topic, q.stem, q.answer_index, q.rationale_correct,
+           q.source_refs, q.is_active, q.created_at,
+           COALESCE(
+               (SELECT jsonb_agg(
+                           jsonb_build_object('label', c.label, 'text', c.text, 'rationale', c.rationale)
+                           ORDER BY c.label)
+                  FROM choices c
+                 WHERE c.question_id = q.id),
+               '[]'::jsonb
+           )
+    FROM questions q
+    JOIN subjects s ON s.id = q.subject_id
+    {where}
+    ORDER BY q.id
+"""
+
+
+def export_questions(path: str, subject: Optional[str] = None, batch_size: int = 2000) -> int:
+    """Stream the question bank to gzip JSONL, one question (with choices) per line.
+
+    Uses a server-side cursor, so memory stays flat regardless of bank size.
+    """
+    ensure_schema()
+    where = "WHERE s.name = %s" if subject else ""
+    count = 0
+    with _conn() as cx, gzip.open(path, "wt", encoding="utf-8") as out:
+        with cx.cursor(name="qbank_export") as cur:
+            cur.itersize = batch_size
+            cur.execute(_EXPORT_SQL.format(where=where), (subject,) if subject else None)
+            for qid, subj, topic, stem, answer_index, rationale, refs, active, created, choices in cur:
+                out.write(json.dumps({
+                    "id": qid,
+                    "subject": subj,
+                    "topic": topic,
+                    "stem": stem,
+                    "answer_index": answer_index,
+                    "rationale_correct": rationale,
+                    "source_refs": refs,
+                    "is_active": active,
+                    "created_at": created.isoformat(),
+                    "choices": choices,
+                }, ensure_ascii=False, separators=(",", ":")))
+                out.write("\n")
+                count += 1
+    return count
+
+
+def import_questions(path: str, batch_size: int = 5000) -> Tuple[int, int]:
+    """Load a gzip JSONL export with COPY; returns (imported, skipped_duplicates).
+
+    Question ids are reassigned from the local sequence and subjects are
+    matched by name. Stems whose fingerprint already exists locally (or
+    earlier in the file) are skipped.
+    """
+    ensure_schema()
+    imported = skipped = 0
+    subject_ids: Dict[str, int] = {}
+    with _conn() as cx:
+        # Stream existing stems server-side, like export; only fingerprints are kept
+        with cx.cursor(name="qbank_import_stems") as cur:
+            cur.itersize = batch_size
+            cur.execute("SELECT stem FROM questions")
+            seen = {stem_fingerprint(stem) for (stem,) in cur}
+        cx.commit()
+
+        def flush(batch: List[Dict[str, Any]]) -> None:
+            with cx.cursor() as cur:
+                cur.execute(
+                    "SELECT nextval(pg_get_serial_sequence('questions', 'id')) FROM generate_series(1, %s)",
+                    (len(batch),),
+                )
+                new_ids = [int(r[0]) for r in cur.fetchall()]
+                with cur.copy(
+                    "COPY questions (id, subject_id, topic, stem, answer_index, rationale_correct,"
+                    " source_refs, is_active, created_at) FROM STDIN"
+                ) as copy:
+                    for qid, q in zip(new_ids, batch):
+                        copy.write_row((
+                            qid,
+                            subject_ids[q["subject"]],
+                            q.get("topic") or "General",
+                            q["stem"],
+                            int(q["answer_index"]),
+                            q.get("rationale_correct", ""),
+                            json.dumps(q.get("source_refs") or []),
+                            bool(q.get("is_active", True)),
+                            q.get("created_at") or "now",
+                        ))
+                with cur.copy("COPY choices (question_id, label, text, rationale) FROM STDIN") as copy:
+                    for qid, q in zip(new_ids, batch):
+                        for c in q.get("choices") or []:
+                            copy.write_row((qid, c["label"], c.get("text", ""), c.get("rationale") or ""))
+            cx.commit()
+
+        batch: List[Dict[str, Any]] = []
+        with gzip.open(path, "rt", encoding="utf-8") as src:
+            for line in src:
+                if not line.strip():
+                    continue
+                q = json.loads(line)
+                fp = stem_fingerprint(q["stem"])
+                if fp in seen:
+                    skipped += 1
+                    continue
+                seen.add(fp)
+                if q["subject"] not in subject_ids:
+                    subject_ids[q["subject"]] = upsert_subject(q["subject"])
+                batch.append(q)
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    imported += len(batch)
+                    batch = []
+        if batch:
+            flush(batch)
+            imported += len(batch)
+    return imported, skipped
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Question bank maintenance commands")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("backfill-seen", help="Populate user_seen_questions from existing drill history")
+    sub.add_parser("backfill-stats", help="Rebuild user_daily_stats from existing drill history")
+    docs = sub.add_parser("backfill-docs", help="Build denormalised question documents for existing rows")
+    docs.add_argument("--rebuild", action="store_true", help="Rebuild every document, not only missing ones")
+
+    exp = sub.add_parser("export", help="Stream questions and choices to gzip JSONL")
+    exp.add_argument("path", help="Output file, e.g. qbank.jsonl.gz")
+    exp.add_argument("--subject", help="Only export this subject")
+
+    imp = sub.add_parser("import", help="Load a gzip JSONL export (COPY, new ids, stem de-duplication)")
+    imp.add_argument("path")
+    imp.add_argument("--batch-size", type=int, default=5000)
+
+    bench = sub.add_parser("bench-sampler", help="Compare ORDER BY RANDOM() sampling with the indexed sampler")
+    bench.add_argument("--user-id", required=True)
+    bench.add_argument("--subject-id", type=int, default=None)
+    bench.add_argument("--n", type=int, default=20)
+    bench.add_argument("--repeats", type=int, default=20)
+
+    args = ap.parse_args(argv)
+
+    if args.cmd == "backfill-seen":
+        print(f"Inserted {backfill_seen_questions()} seen-question rows")
+    elif args.cmd == "backfill-stats":
+        print(f"Wrote {backfill_daily_stats()} daily stats rows")
+    elif args.cmd == "backfill-docs":
+        print(f"Built {backfill_question_docs(args.rebuild)} question documents")
+    elif args.cmd == "export":
+        start = time.perf_counter()
+        n = export_questions(args.path, args.subject)
+        print(f"Exported {n} questions to {args.path} in {time.perf_counter() - start:.1f}s")
+    elif args.cmd == "import":
+        start = time.perf_counter()
+        n, dup = import_questions(args.path, args.batch_size)
+        print(f"Imported {n} questions ({dup} duplicate stems skipped) in {time.perf_counter() - start:.1f}s")
+    elif args.cmd == "bench-sampler":
+        res = benchmark_unseen_sampler(args.user_id, args.subject_id, args.n, args.repeats)
+        for name, ms in res.items():
+            print(f"{name:>8}: {ms:8.2f} ms/call")
+        if res.get("indexed"):
+            print(f" speedup: {res['legacy'] / res['indexed']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,20 +1,50 @@
 from __future__ import annotations
 
+import argparse
+import atexit
+import contextlib
+import fcntl
+import gzip
 import hashlib
+import json
+import logging
+import re
+import tempfile
+import time
 import uuid
 import os
-from dataclasses import dataclass
-from typing import Iterable, List, Dict
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, List, Dict, Optional, Sequence, Tuple
 
-import numpy as np
-from qdrant_client import QdrantClient
-from qdrant_client.http import models as qmodels
+from lazy import lazy_module
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+np = lazy_module("numpy")
+qmodels = lazy_module("qdrant_client.http.models")
 
 
 DEFAULT_COLLECTION = os.getenv("QDRANT_COLLECTION", "sqe1_material")
+# Storage precision for new collections: "float32", "float16" or "int8"
+# (int8 = Qdrant scalar quantisation held in RAM, float32 originals kept on
+# disk for rescoring). float16 needs Qdrant / qdrant-client >= 1.10.
+DEFAULT_PRECISION = os.getenv("QDRANT_VECTOR_PRECISION", "float32")
+PRECISIONS = ("float32", "float16", "int8")
+# Named sparse (lexical) vector stored alongside the unnamed dense vector
+SPARSE_VECTOR = "text"
+
+
+def default_search_cache_dir() -> str:
+    # Resolved on call, so a .env loaded after import is honoured
+    return os.getenv("QDRANT_SEARCH_CACHE_DIR", "ops/data/search_cache")
 
 
 def _build_client() -> QdrantClient:
+    from qdrant_client import QdrantClient
+
     api_key = os.getenv("QDRANT_API_KEY")
     url = os.getenv("QDRANT_URL")
     if url:
@@ -35,19 +65,310 @@ class EmbeddingRecord:
     chunk_index: int
     text: str
     vec: np.ndarray  # float32
+    content_hash: Optional[str] = None
+    # Every (source_path, page, chunk_index) where this exact chunk text occurs
+    occurrences: List[Dict] = field(default_factory=list)
+    sparse: Optional[Tuple[List[int], List[float]]] = None  # (term ids, weights)
+
+
+def reduce_dim(vec: np.ndarray, dims: Optional[int]) -> np.ndarray:
+    """Truncate embeddings to ``dims`` and L2-renormalise (text-embedding-3 style)."""
+    arr = np.asarray(vec, dtype=np.float32)
+    if dims:
+        arr = arr[..., :dims]
+    norm = np.linalg.norm(arr, axis=-1, keepdims=True)
+    return arr / np.where(norm == 0, 1.0, norm)
+
+
+def quantise_roundtrip(mat: np.ndarray, precision: str) -> np.ndarray:
+    """Apply storage precision loss to ``mat`` and return float32 again.
+
+    int8 mirrors Qdrant's scalar quantisation: one shared range taken from the
+    0.5/99.5 percentiles, mapped onto 256 levels.
+    """
+    arr = np.asarray(mat, dtype=np.float32)
+    if precision == "float16":
+        return arr.astype(np.float16).astype(np.float32)
+    if precision == "int8":
+        lo, hi = np.quantile(arr, [0.005, 0.995])
+        scale = (hi - lo) / 255.0 or 1.0
+        q = np.clip(np.round((arr - lo) / scale), 0, 255)
+        return (q * scale + lo).astype(np.float32)
+    return arr
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def _term_id(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def sparse_terms(text: str, k1: float = 1.2) -> Tuple[List[int], List[float]]:
+    """BM25-style saturated term frequencies over hashed lowercase tokens.
+
+    IDF is applied server-side (Qdrant ``Modifier.IDF``), so weights here only
+    depend on the chunk itself. Case names and neutral citations survive as
+    tokens ("uksc", "2019", ...), which is what dense search misses.
+    """
+    tf = Counter(_term_id(t) for t in _TOKEN_RE.findall(text.lower()))
+    indices = sorted(tf)
+    return indices, [tf[i] * (k1 + 1) / (tf[i] + k1) for i in indices]
+
+
+def query_sparse_terms(text: str) -> Tuple[List[int], List[float]]:
+    indices = sorted({_term_id(t) for t in _TOKEN_RE.findall(text.lower())})
+    return indices, [1.0] * len(indices)
+
+
+class SearchCache:
+    """Bounded LRU of search results, invalidated by per-subject version counters.
+
+    Keys combine collection, subject, a quantised hash of the query vector,
+    top_k and the lexical query text. Every write through
+    ``QdrantVectorStore`` bumps the subject's version, so stale entries are
+    never served; entries also expire after ``ttl_hours``. The cache is
+    bounded by an estimate of the bytes held (hit texts dominate).
+
+    With ``path`` set, versions live in ``versions.json`` there (bumped under
+    an ``flock``, re-read whenever another process changes it) and results are
+    persisted to ``results.json.gz`` at exit for the next run. Versions are
+    tagged with an epoch; an unreadable versions file starts a new epoch,
+    which invalidates every cached entry.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        path: Optional[str] = None,
+        persist_results: bool = True,
+        ttl_hours: float = 168.0,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl_hours * 3600
+        self.path = path
+        # key -> (subject, version, stored_at, hits)
+        self._entries: "OrderedDict[str, Tuple[str, str, float, List[Dict]]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._size = 0
+        self._epoch = ""
+        self._versions: Dict[str, int] = {}
+        self._versions_mtime: Optional[float] = None
+        if path:
+            os.makedirs(path, exist_ok=True)
+            if persist_results:
+                self._load()
+                atexit.register(self.save)
+
+    @staticmethod
+    def key(collection: str, subject: str, query_vec: np.ndarray, top_k: int, query_text: Optional[str]) -> str:
+        quantised = np.round(np.asarray(query_vec, dtype=np.float32) * 1024).astype(np.int16)
+        h = hashlib.sha1(quantised.tobytes())
+        h.update(f"|{collection}|{subject}|{top_k}|{query_text or ''}".encode("utf-8"))
+        return h.hexdigest()
+
+    def _versions_file(self) -> str:
+        return os.path.join(self.path, "versions.json")
+
+    def _results_file(self) -> str:
+        return os.path.join(self.path, "results.json.gz")
+
+    def _write_atomic(self, target: str, data, compress: bool = False) -> None:
+        # Unique temp file per writer, so concurrent processes never share one
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=os.path.basename(target) + ".")
+        payload = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(payload) if compress else payload)
+            os.replace(tmp, target)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _read_versions(self) -> None:
+        try:
+            with open(self._versions_file(), encoding="utf-8") as f:
+                stored = json.load(f)
+            self._epoch = str(stored["epoch"])
+            self._versions = {k: int(v) for k, v in stored["subjects"].items()}
+        except FileNotFoundError:
+            self._epoch, self._versions = "", {}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logging.warning("Unreadable search cache versions in %s; invalidating all cached results.", self.path)
+            self._epoch, self._versions = uuid.uuid4().hex, {}
+            self._entries.clear()
+            self._sizes.clear()
+            self._size = 0
+            self._write_versions()
+
+    def _write_versions(self) -> None:
+        self._write_atomic(self._versions_file(), {"epoch": self._epoch, "subjects": self._versions})
+        self._versions_mtime = os.stat(self._versions_file()).st_mtime
+
+    def _refresh_versions(self) -> None:
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self._versions_file()).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._versions_mtime:
+            with self._locked():
+                self._read_versions()
+            self._versions_mtime = mtime
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(os.path.join(self.path, "versions.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def version(self, subject: str) -> str:
+        self._refresh_versions()
+        return self._current_version(subject)
+
+    def _current_version(self, subject: str) -> str:
+        # No refresh: safe to call while holding _locked()
+        return f"{self._epoch}:{self._versions.get(subject, 0)}"
+
+    def _is_fresh(self, entry: Tuple[str, str, float, List[Dict]], now: float) -> bool:
+        subject, version, stored_at, _hits = entry
+        return version == self._current_version(subject) and now - stored_at <= self.ttl
+
+    def bump(self, subject: str) -> None:
+        if not self.path:
+            self._versions[subject] = self._versions.get(subject, 0) + 1
+            return
+        # Read-modify-write under the lock so concurrent bumps are never lost
+        with self._locked():
+            self._read_versions()
+            self._versions[subject] = self._versions.get(subject, 0) + 1
+            self._write_versions()
+
+    def get(self, key: str, subject: str) -> Optional[List[Dict]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] != self.version(subject) or time.time() - entry[2] > self.ttl:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return [dict(h) for h in entry[3]]
+
+    def put(self, key: str, subject: str, hits: List[Dict]) -> None:
+        self._add(key, subject, self.version(subject), time.time(), [dict(h) for h in hits])
+        while self._size > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+
+    def _add(self, key: str, subject: str, version: str, stored_at: float, hits: List[Dict]) -> None:
+        if key in self._entries:
+            self._drop(key)
+        size = self._entry_bytes(hits)
+        self._entries[key] = (subject, version, stored_at, hits)
+        self._sizes[key] = size
+        self._size += size
+
+    @staticmethod
+    def _entry_bytes(hits: List[Dict]) -> int:
+        # Rough footprint: chunk text plus fixed per-hit overhead for ids and payload fields
+        return sum(len(h.get("text") or "") + 512 for h in hits)
+
+    def _drop(self, key: str) -> None:
+        # Tolerates keys already cleared by an epoch reset
+        if self._entries.pop(key, None) is not None:
+            self._size -= self._sizes.pop(key)
+
+    def _stored_entries(self) -> Dict[str, Tuple[str, str, float, List[Dict]]]:
+        """Fresh entries from ``results.json.gz`` (versions must already be refreshed)."""
+        try:
+            with gzip.open(self._results_file(), "rt", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, OSError, ValueError):
+            return {}
+        now = time.time()
+        entries = {}
+        for key, entry in stored.items():
+            try:
+                subject, version, stored_at, hits = entry
+            except (TypeError, ValueError):
+                continue  # written by an older cache format
+            if self._is_fresh((subject, version, stored_at, hits), now):
+                entries[key] = (subject, version, stored_at, hits)
+        return entries
+
+    def _load(self) -> None:
+        self._refresh_versions()
+        for key, entry in self._stored_entries().items():
+            self._add(key, *entry)
+            if self._size > self.max_bytes:
+                self._drop(key)
+                break
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        self._refresh_versions()
+        now = time.time()
+        with self._locked():
+            # Merge with results saved by runs that overlapped this one; the
+            # most recently stored entry per key wins.
+            merged = self._stored_entries()
+            for key, entry in self._entries.items():
+                if self._is_fresh(entry, now) and (key not in merged or merged[key][2] <= entry[2]):
+                    merged[key] = entry
+            keep: List[Tuple[str, Tuple]] = []
+            size = 0
+            for key, entry in sorted(merged.items(), key=lambda kv: kv[1][2], reverse=True):
+                size += self._entry_bytes(entry[3])
+                if size > self.max_bytes:
+                    break
+                keep.append((key, entry))
+            # Oldest first, matching LRU order when the next run loads the file
+            self._write_atomic(self._results_file(), {k: list(v) for k, v in reversed(keep)}, compress=True)
 
 
 class QdrantVectorStore:
-    def __init__(self, collection: str = DEFAULT_COLLECTION):
+    def __init__(
+        self,
+        collection: str = DEFAULT_COLLECTION,
+        precision: str = DEFAULT_PRECISION,
+        cache: Optional[SearchCache] = None,
+    ):
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}, got '{precision}'")
         self.collection = collection
+        self.precision = precision
+        self.cache = cache
         self.client = _build_client()
+        self._sparse_ready: Optional[bool] = None
 
     def _ensure_collection(self, dim: int) -> None:
         if not self.client.collection_exists(self.collection):
-            self.client.recreate_collection(
+            params = {"size": dim, "distance": qmodels.Distance.COSINE}
+            quantization_config = None
+            if self.precision == "float16":
+                params["datatype"] = qmodels.Datatype.FLOAT16
+            elif self.precision == "int8":
+                # Only the int8 copy stays in RAM; originals are read from disk to rescore
+                params["on_disk"] = True
+                quantization_config = qmodels.ScalarQuantization(
+                    scalar=qmodels.ScalarQuantizationConfig(
+                        type=qmodels.ScalarType.INT8, quantile=0.99, always_ram=True
+                    )
+                )
+            self.client.create_collection(
                 collection_name=self.collection,
-                vectors_config=qmodels.VectorParams(size=dim, distance=qmodels.Distance.COSINE),
+                vectors_config=qmodels.VectorParams(**params),
+                sparse_vectors_config={SPARSE_VECTOR: qmodels.SparseVectorParams(modifier=qmodels.Modifier.IDF)},
+                quantization_config=quantization_config,
             )
+            self._sparse_ready = True
             return
 
         info = self.client.get_collection(self.collection)
@@ -56,6 +377,25 @@ class QdrantVectorStore:
             raise ValueError(
                 f"Qdrant collection '{self.collection}' expects dimension {existing_dim}, got {dim}"
             )
+        existing_precision = _collection_precision(info)
+        if existing_precision != self.precision:
+            logging.warning(
+                "Qdrant collection '%s' stores %s vectors; requested precision %s only applies to new collections.",
+                self.collection, existing_precision, self.precision,
+            )
+
+    def _has_sparse(self) -> bool:
+        if self._sparse_ready is None:
+            info = self.client.get_collection(self.collection)
+            self._sparse_ready = SPARSE_VECTOR in (info.config.params.sparse_vectors or {})
+            if not self._sparse_ready:
+                # A named vector cannot be added to a live collection; see `reindex`
+                logging.warning(
+                    "Qdrant collection '%s' has no '%s' sparse vector; using dense-only search. "
+                    "Run `vector_store.py reindex` to build a hybrid copy.",
+                    self.collection, SPARSE_VECTOR,
+                )
+        return self._sparse_ready
 
     def upsert(self, items: Iterable[EmbeddingRecord]) -> None:
         batch = list(items)
@@ -66,25 +406,141 @@ class QdrantVectorStore:
         dim = int(vectors[0].shape[0])
         self._ensure_collection(dim)
 
+        with_sparse = self._has_sparse()
         points = []
         for it, vec in zip(batch, vectors):
+            vector = {"": vec.tolist()}
+            if with_sparse:
+                sparse = it.sparse or sparse_terms(it.text)
+                vector[SPARSE_VECTOR] = qmodels.SparseVector(indices=sparse[0], values=sparse[1])
             points.append(
                 qmodels.PointStruct(
                     id=it.id,
-                    vector=vec.tolist(),
+                    vector=vector,
                     payload={
                         "subject": it.subject,
                         "source_path": it.source_path,
                         "page": int(it.page),
                         "chunk_index": int(it.chunk_index),
                         "text": it.text,
+                        "content_hash": it.content_hash or content_hash(it.text),
+                        "occurrences": it.occurrences or [
+                            {"source_path": it.source_path, "page": int(it.page), "chunk_index": int(it.chunk_index)}
+                        ],
                     },
                 )
             )
 
         self.client.upsert(collection_name=self.collection, points=points)
+        self._bump({it.subject for it in batch})
+
+    def _bump(self, subjects: Iterable[str]) -> None:
+        if self.cache is not None:
+            for subject in subjects:
+                self.cache.bump(subject)
 
-    def search(self, subject: str, query_vec: np.ndarray, top_k: int = 12) -> List[dict]:
+    def delete(self, subject: str, ids: List[str]) -> int:
+        """Delete whichever ``ids`` exist; returns how many were removed."""
+        if not ids or not self.client.collection_exists(self.collection):
+            return 0
+        present = self.client.retrieve(
+            collection_name=self.collection,
+            ids=ids,
+            with_payload=False,
+            with_vectors=False,
+        )
+        present_ids = [p.id for p in present or []]
+        if not present_ids:
+            return 0
+        self.client.delete(
+            collection_name=self.collection,
+            points_selector=qmodels.PointIdsList(points=present_ids),
+        )
+        self._bump([subject])
+        return len(present_ids)
+
+    def fetch_occurrences(self, ids: List[str]) -> Dict[str, List[Dict]]:
+        """Return existing ``occurrences`` payloads for whichever ``ids`` are already stored."""
+        if not ids or not self.client.collection_exists(self.collection):
+            return {}
+        points = self.client.retrieve(
+            collection_name=self.collection,
+            ids=ids,
+            with_payload=["occurrences"],
+            with_vectors=False,
+        )
+        return {str(p.id): list((p.payload or {}).get("occurrences") or []) for p in points or []}
+
+    def set_occurrences(self, subject: str, point_id: str, occurrences: List[Dict]) -> None:
+        """Replace a point's locations; the first one becomes its ``source_path``/``page``/``chunk_index``."""
+        first = occurrences[0]
+        self.client.set_payload(
+            collection_name=self.collection,
+            payload={
+                "occurrences": occurrences,
+                "source_path": first["source_path"],
+                "page": int(first["page"]),
+                "chunk_index": int(first["chunk_index"]),
+            },
+            points=[point_id],
+        )
+        self._bump([subject])
+
+    def missing_sparse(self, ids: List[str]) -> List[str]:
+        """Which of ``ids`` are stored without a sparse vector (empty if the collection has none)."""
+        if not ids or not self.client.collection_exists(self.collection) or not self._has_sparse():
+            return []
+        points = self.client.retrieve(
+            collection_name=self.collection,
+            ids=ids,
+            with_payload=False,
+            with_vectors=[SPARSE_VECTOR],
+        )
+        return [
+            str(p.id) for p in points or []
+            if not (isinstance(p.vector, dict) and p.vector.get(SPARSE_VECTOR))
+        ]
+
+    def set_sparse(self, subject: str, items: Dict[str, Tuple[List[int], List[float]]]) -> None:
+        """Attach sparse vectors to points that already hold a dense vector."""
+        if not items or not self._has_sparse():
+            return
+        self.client.update_vectors(
+            collection_name=self.collection,
+            points=[
+                qmodels.PointVectors(
+                    id=pid,
+                    vector={SPARSE_VECTOR: qmodels.SparseVector(indices=idx, values=vals)},
+                )
+                for pid, (idx, vals) in items.items()
+            ],
+        )
+        self._bump([subject])
+
+    def search(
+        self,
+        subject: str,
+        query_vec: np.ndarray,
+        top_k: int = 12,
+        query_text: Optional[str] = None,
+    ) -> List[dict]:
+        """Dense search, or dense + sparse fused by reciprocal rank when ``query_text`` is given."""
+        if self.cache is None:
+            return self._search(subject, query_vec, top_k, query_text)
+        key = SearchCache.key(self.collection, subject, query_vec, top_k, query_text)
+        hits = self.cache.get(key, subject)
+        if hits is None:
+            hits = self._search(subject, query_vec, top_k, query_text)
+            self.cache.put(key, subject, hits)
+        return hits
+
+    def _search(
+        self,
+        subject: str,
+        query_vec: np.ndarray,
+        top_k: int,
+        query_text: Optional[str],
+    ) -> List[dict]:
         if not self.client.collection_exists(self.collection):
             return []
 
@@ -93,41 +549,253 @@ class QdrantVectorStore:
             must=[qmodels.FieldCondition(key="subject", match=qmodels.MatchValue(value=subject))]
         )
 
-        # Newer qdrant-client (expects query_vector / query_filter)
-        try:
-            results = self.client.search(
+        # Over-fetch so hits dropped as duplicate content below do not shorten the result
+        fetch_k = top_k * 2
+
+        sparse_idx: List[int] = []
+        if query_text and self._has_sparse():
+            sparse_idx, sparse_vals = query_sparse_terms(query_text)
+
+        if sparse_idx:
+            # Dense and lexical legs fused by Qdrant's reciprocal-rank fusion in one round trip
+            response = self.client.query_points(
                 collection_name=self.collection,
-                query_vector=vector,
-                query_filter=flt,
-                limit=top_k,
+                prefetch=[
+                    qmodels.Prefetch(query=vector, filter=flt, limit=fetch_k),
+                    qmodels.Prefetch(
+                        query=qmodels.SparseVector(indices=sparse_idx, values=sparse_vals),
+                        using=SPARSE_VECTOR,
+                        filter=flt,
+                        limit=fetch_k,
+                    ),
+                ],
+                query=qmodels.FusionQuery(fusion=qmodels.Fusion.RRF),
+                limit=fetch_k,
                 with_payload=True,
                 with_vectors=False,
             )
-        # Older qdrant-client fallback (vector / filter)
-        except TypeError:
-            results = self.client.search(
+        else:
+            response = self.client.query_points(
                 collection_name=self.collection,
-                vector=vector,
-                filter=flt,
-                limit=top_k,
+                query=vector,
+                query_filter=flt,
+                limit=fetch_k,
                 with_payload=True,
+                with_vectors=False,
             )
+        results = response.points
 
+        # One hit per unique chunk text; points written before content
+        # addressing may still hold duplicate copies under different paths.
         hits: List[Dict] = []
+        seen_hashes = set()
         for hit in results or []:
             pl = hit.payload or {}
-            hits.append({
-                "id": str(hit.id),
-                "score": float(hit.score) if getattr(hit, "score", None) is not None else 0.0,
-                "subject": pl.get("subject"),
-                "source_path": pl.get("source_path"),
-                "page": pl.get("page"),
-                "chunk_index": pl.get("chunk_index"),
-                "text": pl.get("text"),
-            })
+            digest = pl.get("content_hash") or content_hash(pl.get("text") or "")
+            if digest in seen_hashes:
+                continue
+            seen_hashes.add(digest)
+            hits.append(_hit_dict(hit, digest))
+            if len(hits) == top_k:
+                break
         return hits
 
+    def iter_points(self, batch_size: int = 256) -> Iterable[list]:
+        """Scroll the whole collection in batches, with payload and vectors."""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if points:
+                yield points
+            if offset is None:
+                break
+
+    def fetch_hits(self, ids: List[str]) -> List[Dict]:
+        """Re-read hits by point id, in the given order (missing points are dropped)."""
+        if not ids or not self.client.collection_exists(self.collection):
+            return []
+        points = self.client.retrieve(
+            collection_name=self.collection,
+            ids=ids,
+            with_payload=True,
+            with_vectors=False,
+        )
+        by_id = {str(p.id): p for p in points or []}
+        return [_hit_dict(by_id[pid]) for pid in ids if pid in by_id]
+
+
+def _hit_dict(point, digest: Optional[str] = None) -> Dict:
+    pl = point.payload or {}
+    return {
+        "id": str(point.id),
+        "score": float(point.score) if getattr(point, "score", None) is not None else 0.0,
+        "subject": pl.get("subject"),
+        "source_path": pl.get("source_path"),
+        "page": pl.get("page"),
+        "chunk_index": pl.get("chunk_index"),
+        "text": pl.get("text"),
+        "content_hash": digest or pl.get("content_hash") or content_hash(pl.get("text") or ""),
+        "occurrences": pl.get("occurrences") or [],
+    }
+
+
+def _collection_precision(info) -> str:
+    params = info.config.params.vectors
+    if getattr(params, "datatype", None) == qmodels.Datatype.FLOAT16:
+        return "float16"
+    if isinstance(info.config.quantization_config, qmodels.ScalarQuantization):
+        return "int8"
+    return "float32"
+
+
+def normalise_chunk_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalise_chunk_text(text).encode("utf-8")).hexdigest()
+
+
+def content_id(subject: str, digest: str) -> str:
+    # One point per unique chunk per subject, wherever it appears
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{subject}|sha256:{digest}"))
+
+
 def emb_id(subject: str, source_path: str, page: int, chunk_idx: int) -> str:
     key = f"{subject}|{source_path}|{page}|{chunk_idx}"
     # Stable, deterministic UUID from the key
     return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+def reindex(source: QdrantVectorStore, target: QdrantVectorStore, batch_size: int = 256) -> int:
+    """Copy every point into ``target`` (a new collection), adding sparse vectors.
+
+    Dense vectors are copied, not re-embedded. Returns the number of points copied.
+    """
+    copied = 0
+    for points in source.iter_points(batch_size):
+        recs: List[EmbeddingRecord] = []
+        for p in points:
+            pl = p.payload or {}
+            vec = p.vector.get("") if isinstance(p.vector, dict) else p.vector
+            if vec is None:
+                continue
+            text = pl.get("text") or ""
+            recs.append(EmbeddingRecord(
+                id=str(p.id), subject=pl.get("subject"), source_path=pl.get("source_path"),
+                page=pl.get("page") or 0, chunk_index=pl.get("chunk_index") or 0, text=text,
+                vec=vec, content_hash=pl.get("content_hash"), occurrences=pl.get("occurrences") or [],
+                sparse=sparse_terms(text),
+            ))
+        target.upsert(recs)
+        copied += len(recs)
+        logging.info("Reindexed %d points", copied)
+    return copied
+
+
+def _sample_vectors(store: QdrantVectorStore, subject: str, limit: int) -> np.ndarray:
+    flt = qmodels.Filter(
+        must=[qmodels.FieldCondition(key="subject", match=qmodels.MatchValue(value=subject))]
+    )
+    vecs: List[List[float]] = []
+    offset = None
+    while len(vecs) < limit:
+        points, offset = store.client.scroll(
+            collection_name=store.collection,
+            scroll_filter=flt,
+            limit=min(256, limit - len(vecs)),
+            offset=offset,
+            with_payload=False,
+            with_vectors=True,
+        )
+        for p in points:
+            vec = p.vector.get("") if isinstance(p.vector, dict) else p.vector
+            if vec is not None:
+                vecs.append(vec)
+        if offset is None:
+            break
+    return np.asarray(vecs, dtype=np.float32)
+
+
+def recall_at_k(base: np.ndarray, query_idx: Sequence[int], k: int, dims: Optional[int], precision: str) -> float:
+    """Mean overlap of reduced/quantised top-k with full-precision top-k.
+
+    Each sampled vector queries the rest of the sample (itself excluded), so
+    no embedding calls are needed.
+    """
+    full = reduce_dim(base, None)
+    approx = quantise_roundtrip(reduce_dim(base, dims), precision)
+    total = 0.0
+    for qi in query_idx:
+        exact = full @ full[qi]
+        exact[qi] = -np.inf
+        cand = approx @ reduce_dim(base[qi], dims)
+        cand[qi] = -np.inf
+        truth = set(np.argpartition(-exact, k)[:k])
+        got = set(np.argpartition(-cand, k)[:k])
+        total += len(truth & got) / k
+    return total / max(1, len(query_idx))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Vector store maintenance commands")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    bench = sub.add_parser("bench-recall", help="recall@k of reduced-dimension/quantised vectors vs full float32")
+    bench.add_argument("--subject", required=True)
+    bench.add_argument("--collection", default=DEFAULT_COLLECTION)
+    bench.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1024])
+    bench.add_argument("--precision", nargs="+", choices=PRECISIONS, default=list(PRECISIONS))
+    bench.add_argument("--k", type=int, default=12)
+    bench.add_argument("--sample", type=int, default=5000, help="Vectors pulled from the collection")
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--seed", type=int, default=0)
+
+    rx = sub.add_parser("reindex", help="Copy a collection into a new one with the hybrid sparse vector")
+    rx.add_argument("--from", dest="source", default=DEFAULT_COLLECTION)
+    rx.add_argument("--to", dest="target", required=True)
+    rx.add_argument("--precision", choices=PRECISIONS, default=DEFAULT_PRECISION)
+    rx.add_argument("--batch-size", type=int, default=256)
+
+    args = ap.parse_args(argv)
+
+    if args.cmd == "reindex":
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+        source = QdrantVectorStore(collection=args.source)
+        target = QdrantVectorStore(collection=args.target, precision=args.precision)
+        if args.source == args.target:
+            print("--to must name a new collection")
+            return 1
+        if target.client.collection_exists(args.target) and not target._has_sparse():
+            print(f"Collection '{args.target}' already exists without the '{SPARSE_VECTOR}' sparse vector")
+            return 1
+        n = reindex(source, target, args.batch_size)
+        print(f"Copied {n} points from '{args.source}' to '{args.target}'. "
+              f"Point QDRANT_COLLECTION at '{args.target}' to use hybrid search.")
+    elif args.cmd == "bench-recall":
+        store = QdrantVectorStore(collection=args.collection)
+        base = _sample_vectors(store, args.subject, args.sample)
+        if len(base) <= args.k:
+            print(f"Only {len(base)} vectors for '{args.subject}'; need more than k={args.k}")
+            return 1
+        rng = np.random.default_rng(args.seed)
+        query_idx = rng.choice(len(base), size=min(args.queries, len(base)), replace=False)
+        full_dim = base.shape[1]
+        print(f"{len(base)} vectors, dim {full_dim}, {len(query_idx)} queries, k={args.k}")
+        print(f"{'dims':>6} {'precision':>9} {'bytes/vec':>9} {'recall@k':>9}")
+        for dims in sorted({d for d in args.dims if d <= full_dim} | {full_dim}, reverse=True):
+            for precision in args.precision:
+                width = {"float32": 4, "float16": 2, "int8": 1}[precision]
+                r = recall_at_k(base, query_idx, args.k, dims, precision)
+                print(f"{dims:>6} {precision:>9} {dims * width:>9} {r:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
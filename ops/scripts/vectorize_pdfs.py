@@ -1,21 +1,20 @@
 """Vectorise PDFs and upsert embeddings into Qdrant (per subject)."""
 from __future__ import annotations
 import os, argparse, logging, pathlib
-from typing import List, Tuple
-import numpy as np
-from pypdf import PdfReader
-from tenacity import retry, wait_exponential, stop_after_attempt
-from dotenv import load_dotenv
-import tiktoken
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-from openai import AzureOpenAI
-from vector_store import QdrantVectorStore, EmbeddingRecord, emb_id
+from lazy import lazy_module
+from vector_store import QdrantVectorStore, SearchCache, default_search_cache_dir, EmbeddingRecord, content_hash, content_id, emb_id, reduce_dim, sparse_terms, PRECISIONS
 
-load_dotenv(".env.ai", override=True)
-logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+if TYPE_CHECKING:
+    import numpy as np
+    from openai import AzureOpenAI
+
+tiktoken = lazy_module("tiktoken")
 
 def embed_client() -> AzureOpenAI:
     # Uses the *embeddings* resource (endpoint/key/version) from .env.ai
+    from openai import AzureOpenAI
     return AzureOpenAI(
         api_key=os.environ["AOAI_EMBEDDINGS_KEY"],
         azure_endpoint=os.environ["AOAI_EMBEDDINGS_ENDPOINT"].rstrip("/"),
@@ -23,6 +22,7 @@ def embed_client() -> AzureOpenAI:
     )
 
 def read_pdf_texts(pdf_path: str) -> List[Tuple[int, str]]:
+    from pypdf import PdfReader
     pages = []
     r = PdfReader(pdf_path)
     for i, p in enumerate(r.pages):
@@ -46,12 +46,24 @@ def chunk_by_tokens(text: str, max_tokens=800, overlap=120) -> List[str]:
         i += step
     return out
 
-@retry(wait=wait_exponential(multiplier=1, min=1, max=20), stop=stop_after_attempt(5))
-def embed_batch(cli: AzureOpenAI, deployment: str, texts: List[str]) -> List[List[float]]:
-    res = cli.embeddings.create(model=deployment, input=texts)  # deployment name, not base model
-    return [d.embedding for d in res.data]
+def embed_batch(cli: AzureOpenAI, deployment: str, texts: List[str], dims: Optional[int] = None,
+                request_dims: bool = True) -> List[np.ndarray]:
+    from tenacity import Retrying, wait_exponential, stop_after_attempt
+    # text-embedding-3 deployments accept `dimensions`; older models are truncated locally
+    kwargs = {"dimensions": dims} if dims and request_dims else {}
+    for attempt in Retrying(wait=wait_exponential(multiplier=1, min=1, max=20), stop=stop_after_attempt(5)):
+        with attempt:
+            res = cli.embeddings.create(model=deployment, input=texts, **kwargs)  # deployment name, not base model
+    return [reduce_dim(d.embedding, dims) for d in res.data]
+
+def _under(path: str, root: str) -> bool:
+    return os.path.abspath(path).startswith(root + os.sep)
 
 def main():
+    from dotenv import load_dotenv
+    load_dotenv(".env.ai", override=True)  # before argparse: defaults read AOAI_* env vars
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
     ap = argparse.ArgumentParser(description="Vectorise PDFs into local store")
     ap.add_argument("--subject", required=True, help="e.g., 'Contract Law'")
     ap.add_argument("--pdfs-dir", required=True, help="Directory of PDFs")
@@ -59,57 +71,112 @@ def main():
     ap.add_argument("--max-tokens", type=int, default=800)
     ap.add_argument("--overlap", type=int, default=120)
     ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--emb-dims", type=int, default=int(os.getenv("AOAI_EMBEDDINGS_DIMENSIONS") or 0) or None,
+                    help="Reduced embedding dimension (text-embedding-3 `dimensions`); default full size.")
+    ap.add_argument("--emb-dims-local", action="store_true",
+                    help="Truncate + renormalise locally instead of requesting `dimensions` from the API.")
+    ap.add_argument("--precision", choices=PRECISIONS, default=os.getenv("QDRANT_VECTOR_PRECISION", "float32"),
+                    help="Vector storage for a new collection: float32, float16 or int8 (scalar-quantised).")
     ap.add_argument(
         "--collection",
         default=os.getenv("QDRANT_COLLECTION"),
         help="Override Qdrant collection name (defaults to QDRANT_COLLECTION env or 'sqe1_material').",
     )
+    ap.add_argument("--search-cache-dir", default=default_search_cache_dir(),
+                    help="Search cache shared with generate_questions.py; its subject version is bumped on writes.")
     args = ap.parse_args()
 
     cli = embed_client()
-    store = QdrantVectorStore(collection=args.collection or os.getenv("QDRANT_COLLECTION", "sqe1_material"))
+    store = QdrantVectorStore(
+        collection=args.collection or os.getenv("QDRANT_COLLECTION", "sqe1_material"),
+        precision=args.precision,
+        # Only used to bump the subject's version so cached searches are invalidated
+        cache=SearchCache(max_bytes=0, path=args.search_cache_dir, persist_results=False),
+    )
 
     pdf_dir = pathlib.Path(args.pdfs_dir)
+    scan_root = os.path.abspath(pdf_dir)
     pdfs = sorted(pdf_dir.rglob("*.pdf"))
     if not pdfs:
         logging.warning("No PDFs found in %s", pdf_dir)
         return 0
 
     logging.info("Found %d PDFs under %s", len(pdfs), pdf_dir)
+
+    # Content-address every chunk first so repeated boilerplate, shared statute
+    # extracts and re-issued PDFs are embedded once, with all their locations.
+    chunks_by_hash: Dict[str, Dict] = {}
+    total_chunks = 0
     for pdf in pdfs:
-        pages = read_pdf_texts(str(pdf))
-        for page, text in pages:
+        for page, text in read_pdf_texts(str(pdf)):
             chunks = chunk_by_tokens(text, max_tokens=args.max_tokens, overlap=args.overlap)
-            batch_recs: List[EmbeddingRecord] = []
-            buf_texts: List[str] = []
-            meta = []
-
             for idx, ch in enumerate(chunks):
-                uid = emb_id(args.subject, str(pdf), page, idx)
-                buf_texts.append(ch)
-                meta.append((uid, args.subject, str(pdf), page, idx, ch))
-
-                if len(buf_texts) >= args.batch_size:
-                    vecs = embed_batch(cli, args.emb_deploy, buf_texts)
-                    for m, v in zip(meta, vecs):
-                        batch_recs.append(EmbeddingRecord(
-                            id=m[0], subject=m[1], source_path=m[2], page=m[3], chunk_index=m[4],
-                            text=m[5], vec=np.asarray(v, dtype=np.float32)
-                        ))
-                    store.upsert(batch_recs)
-                    batch_recs, buf_texts, meta = [], [], []
-
-            if buf_texts:
-                vecs = embed_batch(cli, args.emb_deploy, buf_texts)
-                for m, v in zip(meta, vecs):
-                    batch_recs.append(EmbeddingRecord(
-                        id=m[0], subject=m[1], source_path=m[2], page=m[3], chunk_index=m[4],
-                        text=m[5], vec=np.asarray(v, dtype=np.float32)
-                    ))
-                store.upsert(batch_recs)
-
-        logging.info("Vectorised: %s", pdf.name)
-
+                total_chunks += 1
+                digest = content_hash(ch)
+                entry = chunks_by_hash.setdefault(digest, {"text": ch, "occurrences": []})
+                entry["occurrences"].append({"source_path": str(pdf), "page": page, "chunk_index": idx})
+        logging.info("Chunked: %s", pdf.name)
+
+    logging.info("%d chunks, %d unique", total_chunks, len(chunks_by_hash))
+
+    digests = list(chunks_by_hash)
+    embedded = 0
+    legacy_removed = 0
+    for start in range(0, len(digests), args.batch_size):
+        batch = digests[start:start + args.batch_size]
+        ids = [content_id(args.subject, d) for d in batch]
+        existing = store.fetch_occurrences(ids)
+
+        to_embed: List[Tuple[str, str]] = []
+        for uid, digest in zip(ids, batch):
+            occ = chunks_by_hash[digest]["occurrences"]
+            if uid in existing:
+                # Already embedded: locations under the scanned directory are
+                # replaced by this scan (renamed or removed PDFs drop out); other
+                # locations are kept, and surviving entries keep their order.
+                kept = [o for o in existing[uid] if not _under(o["source_path"], scan_root) or o in occ]
+                merged = kept + [o for o in occ if o not in kept]
+                if merged != existing[uid]:
+                    store.set_occurrences(args.subject, uid, merged)
+            else:
+                to_embed.append((uid, digest))
+
+        # Attach sparse vectors only to stored points that lack one; no-op on dense-only collections
+        digest_by_id = dict(zip(ids, batch))
+        store.set_sparse(args.subject, {
+            uid: sparse_terms(chunks_by_hash[digest_by_id[uid]]["text"])
+            for uid in store.missing_sparse([uid for uid in ids if uid in existing])
+        })
+
+        if not to_embed:
+            continue
+        vecs = embed_batch(cli, args.emb_deploy, [chunks_by_hash[d]["text"] for _uid, d in to_embed],
+                           dims=args.emb_dims, request_dims=not args.emb_dims_local)
+        recs: List[EmbeddingRecord] = []
+        for (uid, digest), v in zip(to_embed, vecs):
+            entry = chunks_by_hash[digest]
+            first = entry["occurrences"][0]
+            recs.append(EmbeddingRecord(
+                id=uid, subject=args.subject, source_path=first["source_path"], page=first["page"],
+                chunk_index=first["chunk_index"], text=entry["text"], vec=v,
+                content_hash=digest, occurrences=entry["occurrences"], sparse=sparse_terms(entry["text"]),
+            ))
+        store.upsert(recs)
+        embedded += len(recs)
+
+    # Points written before content addressing were keyed by location; once
+    # every chunk has its content-addressed copy, drop the per-location ones.
+    for start in range(0, len(digests), args.batch_size):
+        legacy_ids = [
+            emb_id(args.subject, o["source_path"], o["page"], o["chunk_index"])
+            for d in digests[start:start + args.batch_size]
+            for o in chunks_by_hash[d]["occurrences"]
+        ]
+        legacy_removed += store.delete(args.subject, legacy_ids)
+
+    logging.info("Embedded %d new unique chunks (%d already stored)", embedded, len(digests) - embedded)
+    if legacy_removed:
+        logging.info("Removed %d location-keyed points from earlier runs", legacy_removed)
     logging.info("Done.")
     return 0
 
@@ -4,14 +4,20 @@ import { NextRequest, NextResponse } from 'next/server';
 import { query } from '../../../../../lib/db';
 import { readServerUser } from '../../../../../lib/user';
 
-type DrillItemRow = { order_index: number; question_id: number };
-type QuestionRow = {
+type StepRow = {
+  total: number;
+  order_index: number | null;
+  question_id: number | null;
+  doc: QuestionDoc | null;
+};
+type QuestionDoc = {
   id: number;
   stem: string;
   answer_index: number;
   topic: string | null;
   rationale_correct: string | null;
   source_refs: any;
+  choices: ChoiceRow[];
 };
 type ChoiceRow = { label: string; text: string; rationale: string | null };
 
@@ -21,25 +27,26 @@ export async function GET(_: NextRequest, { params }: { params: { sid: string }
 
   const sid = params.sid;
 
-  const sessionRes = await query<{ id: string; total: number }>(
-    'SELECT id, total FROM drill_sessions WHERE id = $1 AND user_id = $2',
+  // Session check, next unanswered item and its question document in one read;
+  // questions.doc is kept in sync by triggers (ops/scripts/question_db.py).
+  const stepRes = await query<StepRow>(
+    `SELECT ds.total, di.order_index, di.question_id, q.doc
+       FROM drill_sessions ds
+       LEFT JOIN LATERAL (
+            SELECT order_index, question_id
+              FROM drill_items
+             WHERE session_id = ds.id AND answered_at IS NULL
+             ORDER BY order_index ASC
+             LIMIT 1
+       ) di ON TRUE
+       LEFT JOIN questions q ON q.id = di.question_id
+      WHERE ds.id = $1 AND ds.user_id = $2`,
     [sid, u.sub]
   );
-  const session = sessionRes.rows[0];
-  if (!session) return NextResponse.json({ error: 'not found' }, { status: 404 });
-
-  const itemRes = await query<DrillItemRow>(
-    `SELECT di.order_index, di.question_id
-       FROM drill_items di
-      WHERE di.session_id = $1
-        AND di.answered_at IS NULL
-      ORDER BY di.order_index ASC
-      LIMIT 1`,
-    [sid]
-  );
-  const item = itemRes.rows[0];
+  const step = stepRes.rows[0];
+  if (!step) return NextResponse.json({ error: 'not found' }, { status: 404 });
 
-  if (!item) {
+  if (step.question_id == null) {
     const summaryRes = await query<{
       total: string | number | null;
       correct: string | number | null;
@@ -89,21 +96,12 @@ export async function GET(_: NextRequest, { params }: { params: { sid: string }
     });
   }
 
-  const questionRes = await query<QuestionRow>(
-    `SELECT q.id, q.stem, q.answer_index, q.topic, q.rationale_correct, q.source_refs
-       FROM questions q WHERE q.id = $1`,
-    [item.question_id]
-  );
-  const q = questionRes.rows[0];
+  const q = step.doc ?? (await loadQuestionDoc(step.question_id));
   if (!q) {
     return NextResponse.json({ error: 'Question not found' }, { status: 404 });
   }
 
-  const choicesRes = await query<ChoiceRow>(
-    'SELECT label, text, rationale FROM choices WHERE question_id = $1 ORDER BY label ASC',
-    [q.id]
-  );
-  const choices = choicesRes.rows.map((c: ChoiceRow) => ({
+  const choices = (q.choices || []).map((c: ChoiceRow) => ({
     label: c.label,
     text: c.text,
     rationale: c.rationale ?? '',
@@ -116,7 +114,7 @@ export async function GET(_: NextRequest, { params }: { params: { sid: string }
 
   return NextResponse.json({
     done: false,
-    progress: { index: item.order_index, total: session.total },
+    progress: { index: step.order_index, total: step.total },
     question: {
       id: q.id,
       stem: q.stem,
@@ -128,3 +126,20 @@ export async function GET(_: NextRequest, { params }: { params: { sid: string }
     },
   });
 }
+
+// Rows written before the doc column existed and not yet backfilled
+// (`question_db.py backfill-docs`) are assembled from the base tables.
+async function loadQuestionDoc(questionId: number): Promise<QuestionDoc | null> {
+  const questionRes = await query<Omit<QuestionDoc, 'choices'>>(
+    `SELECT q.id, q.stem, q.answer_index, q.topic, q.rationale_correct, q.source_refs
+       FROM questions q WHERE q.id = $1`,
+    [questionId]
+  );
+  const q = questionRes.rows[0];
+  if (!q) return null;
+  const choicesRes = await query<ChoiceRow>(
+    'SELECT label, text, rationale FROM choices WHERE question_id = $1 ORDER BY label ASC',
+    [questionId]
+  );
+  return { ...q, choices: choicesRes.rows };
+}
@@ -19,39 +19,43 @@ export async function POST(req: NextRequest) {
 
   const sid = crypto.randomUUID();
 
-  const seenRes = await query<{ question_id: number }>(
-    `SELECT DISTINCT di.question_id
-       FROM drill_items di
-       JOIN drill_sessions ds ON ds.id = di.session_id
-      WHERE ds.user_id = $1`,
-    [u.sub]
-  );
-  const seen = seenRes.rows.map((r: { question_id: number }) => Number(r.question_id));
-
-  let whereClause = 'WHERE q.is_active = TRUE';
-  const params: Array<number | number[]> = [];
-  let paramIndex = 1;
-
+  // Same sampler as ops/scripts/question_db.py sample_unseen_questions: read
+  // forward along the indexed rand_key from a random pivot, wrapping to the
+  // start of the range if the tail runs short. Seen questions come from
+  // user_seen_questions (trigger-maintained) instead of the full history.
+  let subjectClause = '';
+  const params: Array<string | number> = [u.sub];
   if (typeof subject === 'number' || /^[0-9]+$/.test(String(subject))) {
-    whereClause += ` AND q.subject_id = $${paramIndex++}`;
     params.push(Number(subject));
+    subjectClause = `AND q.subject_id = $${params.length}`;
   }
+  const sampleFrom = async (op: '>=' | '<', pivot: number, n: number) => {
+    const res = await query<{ id: number }>(
+      `SELECT q.id
+         FROM questions q
+        WHERE q.is_active
+          ${subjectClause}
+          AND q.rand_key ${op} $${params.length + 1}
+          AND NOT EXISTS (
+              SELECT 1 FROM user_seen_questions s
+               WHERE s.user_id = $1 AND s.question_id = q.id
+          )
+        ORDER BY q.rand_key
+        LIMIT $${params.length + 2}`,
+      [...params, pivot, n]
+    );
+    return res.rows.map((r: { id: number }) => Number(r.id));
+  };
 
-  if (seen.length) {
-    whereClause += ` AND NOT (q.id = ANY($${paramIndex++}::int[]))`;
-    params.push(seen);
+  const pivot = Math.random();
+  const sampleIds = await sampleFrom('>=', pivot, length);
+  if (sampleIds.length < length) {
+    sampleIds.push(...(await sampleFrom('<', pivot, length - sampleIds.length)));
+  }
+  for (let i = sampleIds.length - 1; i > 0; i--) {
+    const j = Math.floor(Math.random() * (i + 1));
+    [sampleIds[i], sampleIds[j]] = [sampleIds[j], sampleIds[i]];
   }
-
-  const limitIdx = paramIndex++;
-  const sampleQuery = `
-    SELECT q.id
-      FROM questions q
-      ${whereClause}
-      ORDER BY RANDOM()
-      LIMIT $${limitIdx}
-  `;
-  const sampleRes = await query<{ id: number }>(sampleQuery, [...params, length]);
-  const sampleIds = sampleRes.rows.map((r: { id: number }) => Number(r.id));
 
   if (sampleIds.length < length) {
     return NextResponse.json({